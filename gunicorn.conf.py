@@ -0,0 +1,21 @@
+# Gunicorn settings for the website. Production command (Render start command):
+#     gunicorn 'src.main:app'
+# Gunicorn reads this file from the working directory automatically.
+# Schema/owner setup is not done per worker; run it once per deploy (build step):
+#     flask --app src.main init-db
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gevent'
+worker_connections = 1000
+# Import the app once in the master so the workers fork with models, blueprints and Jinja already loaded
+preload_app = True
+keepalive = 5
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared between forked workers;
+    # drop them from this worker's pool without closing the parent's sockets.
+    from src.main import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,42 @@
+"""mod indexes, telegram_file_id and case-insensitive category names
+
+Revision ID: 4c8e2d1a6f07
+Revises: b1f0c2a7d9e3
+Create Date: 2026-10-14 15:04:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e2d1a6f07'
+down_revision = 'b1f0c2a7d9e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    is_postgresql = op.get_bind().dialect.name == 'postgresql'
+
+    op.add_column('mods', sa.Column('telegram_file_id', sa.Text(), nullable=True))
+    op.create_index('ix_mod_status_created', 'mods', ['status', 'created_at'], unique=False)
+    op.create_index('ix_mod_status_category', 'mods', ['status', 'category_id'], unique=False)
+    op.create_index('ix_mod_status_name', 'mods', ['status', 'name'], unique=False)
+    if is_postgresql:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_mod_name_trgm', 'mods', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_where=sa.text("status = 'approved'"))
+    op.create_index('ux_category_name_lower', 'categories', [sa.text('lower(name)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('ux_category_name_lower', table_name='categories')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_mod_name_trgm', table_name='mods')
+    op.drop_index('ix_mod_status_name', table_name='mods')
+    op.drop_index('ix_mod_status_category', table_name='mods')
+    op.drop_index('ix_mod_status_created', table_name='mods')
+    with op.batch_alter_table('mods') as batch_op:
+        batch_op.drop_column('telegram_file_id')
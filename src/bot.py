@@ -1,8 +1,19 @@
 # Telegram Bot configuration and handlers
+import io
 import os
 import logging
 import sys # Added sys for path manipulation
+import re
+import time
+import asyncio
+import weakref
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from functools import lru_cache, partial
+from PIL import Image, UnidentifiedImageError
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,6 +22,9 @@ from telegram.ext import (
     ContextTypes,
     CallbackQueryHandler,
     ConversationHandler,
+    TypeHandler,
+    AIORateLimiter,
+    PicklePersistence,
 )
 
 # --- App Context for Database Operations ---
@@ -21,16 +35,24 @@ project_root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.p
 if project_root_path not in sys.path:
     sys.path.insert(0, project_root_path)
 
+# Enable logging (before importing the web app, which may run migrations at import time)
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
 # Try to import Flask app and db for context, but make it optional if bot runs standalone
 try:
     from src.main import app as flask_app, db
     from src.models.mod import Mod
     from src.models.category import Category
     from src.models.admin import Admin
+    from sqlalchemy.exc import IntegrityError
+    from src import caches
     FLASK_APP_AVAILABLE = True
 except ImportError as e:
     FLASK_APP_AVAILABLE = False
-    logging.warning(f"Flask app context not available for bot (may be running standalone): {e}")
+    logging.warning("Flask app context not available for bot (may be running standalone): %s", e)
     # Define dummy db and models if Flask app is not available to prevent crashes on import
     # This is a simplified approach; a more robust solution might involve a shared DB session manager
     class DummyDB:
@@ -39,11 +61,6 @@ except ImportError as e:
     db = DummyDB()
     Mod = Category = Admin = None 
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
-logger = logging.getLogger(__name__)
 
 # --- Configuration ---
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -51,10 +68,35 @@ if not BOT_TOKEN:
     logger.error("FATAL: TELEGRAM_BOT_TOKEN environment variable not set.")
     sys.exit("TELEGRAM_BOT_TOKEN not set.")
 
+# Webhook mode: when TELEGRAM_WEBHOOK_URL (public base URL of the bot service) is set, Telegram
+# pushes updates to us instead of the bot long-polling getUpdates.
+WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET") # Checked against X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_PATH = "telegram-webhook"
+WEBHOOK_PORT = int(os.getenv("PORT", "8443")) # Render provides PORT
+
 OWNER_TELEGRAM_ID = 7839645457 # This could also be an environment variable if it changes
 UPLOAD_FOLDER = os.path.join(project_root_path, "src", "static", "uploads", "mods_images")
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True) # Added exist_ok=True
+
+CONVERSATION_TIMEOUT = 600 # seconds of inactivity before an open conversation is ended
+USER_DATA_TTL = 3600 # seconds of inactivity before a user's user_data is dropped
+USER_DATA_PRUNE_INTERVAL = 300 # seconds between stale user_data sweeps
+IO_EXECUTOR_WORKERS = 8 # threads available to asyncio.to_thread (image reads/writes)
+REVIEW_FLUSH_BATCH_SIZE = 25 # review decisions are written in one transaction when the review ends, or every N decisions
+MOD_IMAGE_MAX_SIZE = (1024, 1024) # uploads are downscaled to fit and stored as WebP
+MOD_IMAGE_WEBP_QUALITY = 80
+# user_data/chat_data and conversation states survive restarts in this file
+PERSISTENCE_FILE = os.getenv("BOT_PERSISTENCE_FILE", os.path.join(project_root_path, "bot_state.pkl"))
+# Only one bot process may poll/serve updates; a second one would make Telegram answer 409 Conflict
+SINGLETON_LOCK_KEY = 0x4D6F6473426F74 # pg advisory lock key ("ModsBot")
+SINGLETON_LOCK_FILE = os.path.join(project_root_path, "bot.lock") # used when there is no PostgreSQL
+SESSION_EXPIRED_TEXT = "⌛ انتهت مهلة الجلسة بسبب عدم النشاط. استخدم /start للبدء من جديد."
+# Per-conversation scratch keys kept in context.user_data; a timeout only clears its own conversation's
+# keys, since the owner can have several conversations open at once
+ADD_MOD_USER_DATA_KEYS = ("current_mod",)
+SUGGEST_MOD_USER_DATA_KEYS = ("suggested_mod",)
+REVIEW_USER_DATA_KEYS = ("pending_mods", "current_review_index", "current_review_mod_id")
+CATEGORY_USER_DATA_KEYS = ("new_category",)
 
 # --- Conversation Handler States ---
 (ADD_MOD_NAME, ADD_MOD_DESCRIPTION, ADD_MOD_LINK, ADD_MOD_IMAGE, ADD_MOD_CONFIRM,
@@ -65,155 +107,416 @@ if not os.path.exists(UPLOAD_FOLDER):
  REVIEW_SUGGESTED_MODS_LIST, REVIEW_MOD_ACTION 
  ) = range(20)
 
+# --- Static Keyboards ---
+# Built once at import; handlers reuse these instead of rebuilding identical button trees.
+USER_START_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("💡 اقتراح مود جديد", callback_data="suggest_new_mod_start")]
+])
+CAT_MANAGE_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ إضافة قسم جديد", callback_data="add_category_start")],
+    # [InlineKeyboardButton("✏️ تعديل قسم موجود", callback_data="edit_category_list")], # TODO
+    # [InlineKeyboardButton("🗑️ حذف قسم موجود", callback_data="delete_category_list")], # TODO
+    [InlineKeyboardButton("📋 عرض كل الأقسام", callback_data="list_all_categories")],
+    [InlineKeyboardButton("🔙 القائمة الرئيسية", callback_data="main_menu_from_cat_manage")]
+])
+CAT_LIST_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ إضافة قسم جديد", callback_data="add_category_start")],
+    [InlineKeyboardButton("🔙 العودة لقائمة إدارة الأقسام", callback_data="manage_categories_menu_from_list")]
+])
+CONFIRM_ADD_CATEGORY_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ نعم، إضافة", callback_data="confirm_add_category_yes")],
+    [InlineKeyboardButton("❌ لا، إلغاء", callback_data="confirm_add_category_cancel")]
+])
+
+# Add (owner) / suggest (user) mod confirmation, keyed by `for_suggestion`
+MOD_ACTION_TEXT = {True: "اقتراح", False: "إضافة"}
+MOD_CONFIRM_TEMPLATE = ("**تفاصيل المود ال{action}:**\n"
+                        "الاسم: {name}\n"
+                        "الوصف: {description}\n"
+                        "الرابط: {download_link}\n"
+                        "الصورة: {image_filename} (تم الحفظ)\n\n"
+                        "هل تريد تأكيد {action} هذا المود؟")
+MOD_CONFIRM_MARKUPS = {
+    for_suggestion: InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"✅ نعم، {MOD_ACTION_TEXT[for_suggestion]}", callback_data=f"{prefix}_yes")],
+        [InlineKeyboardButton("❌ لا، إلغاء", callback_data=f"{prefix}_cancel")]
+    ])
+    for for_suggestion, prefix in ((True, "confirm_suggest_mod"), (False, "confirm_add_mod"))
+}
+
+# The owner menu only varies by the pending count shown on the review button
+@lru_cache(maxsize=32)
+def owner_main_menu_markup(pending_mods_count: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("➕ إضافة مود جديد", callback_data="add_mod_start"),
+         InlineKeyboardButton("🗂️ إدارة الأقسام", callback_data="manage_categories_menu")],
+        [InlineKeyboardButton(f"📝 مراجعة المودات المقترحة ({pending_mods_count})", callback_data="review_suggested_mods_start")],
+        [InlineKeyboardButton("📊 عرض الإحصائيات", callback_data="view_stats")]
+    ])
+
+# --- Callback Data Patterns ---
+# Review buttons carry a mod id, so their callback_data is kept compact ("r:<verb>[:<mod_id>]",
+# well under Telegram's 64-byte limit) and the verb is resolved through this table.
+REVIEW_CALLBACK_PREFIX = "r:"
+REVIEW_ACTIONS = {"a": "approve", "r": "reject", "s": "skip"}
+CALLBACK_PATTERNS = {name: re.compile(pattern) for name, pattern in {
+    "add_mod_start": r"^add_mod_start$",
+    "confirm_add_mod": r"^(confirm_add_mod_yes|confirm_add_mod_cancel)$",
+    "suggest_new_mod_start": r"^suggest_new_mod_start$",
+    "confirm_suggest_mod": r"^(confirm_suggest_mod_yes|confirm_suggest_mod_cancel)$",
+    "review_suggested_mods_start": r"^review_suggested_mods_start$",
+    "review_action": r"^r:([ar]:\d+|s)$",
+    "manage_categories_menu": r"^manage_categories_menu$",
+    "manage_categories_menu_from_list": r"^manage_categories_menu_from_list$",
+    "add_category_start": r"^add_category_start$",
+    "list_all_categories": r"^list_all_categories$",
+    "confirm_add_category": r"^(confirm_add_category_yes|confirm_add_category_cancel)$",
+    "view_stats": r"^view_stats$",
+    "main_menu": r"^main_menu_",
+    "main_menu_from_review": r"^main_menu_from_review$",
+    "main_menu_from_cat_manage": r"^main_menu_from_cat_manage$",
+}.items()}
+
+# Owner gate for callback handlers; the decision is cached per user so later checks are a dict read.
+# Cached in user_data rather than chat_data: in a group chat, chat_data is shared by every member.
+def owner_only(func):
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
+        owner = context.user_data.get("_is_owner") if context.user_data is not None else None
+        if owner is None:
+            owner = is_owner(update)
+            if context.user_data is not None:
+                context.user_data["_is_owner"] = owner
+        if not owner:
+            query = update.callback_query
+            if query:
+                await query.answer()
+                await query.edit_message_text(text="عذراً، هذا الإجراء مخصص للمالك فقط.")
+            return ConversationHandler.END
+        return await func(update, context, *args, **kwargs)
+    return wrapper
+
+# --- Per-Chat Ordering ---
+# Updates are dispatched one at a time (concurrent_updates stays off: ConversationHandler picks the
+# state in check_update, and its PendingState already orders updates within a conversation). IO-heavy
+# handlers run with block=False or as background tasks, so one chat's slow commit or image download
+# doesn't hold up other chats. Only those non-blocking callbacks/tasks (and the timeout job, which
+# runs outside the dispatcher) take the chat's lock: a blocking handler waiting on it would stall
+# the dispatcher for every chat.
+# Wrap at registration time only, so a locked handler calling another handler can't deadlock.
+# Weak values: a chat's lock lives only while some handler holds or waits on it.
+_chat_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def get_chat_lock(chat_id: int) -> asyncio.Lock:
+    lock = _chat_locks.get(chat_id)
+    if lock is None:
+        lock = _chat_locks[chat_id] = asyncio.Lock()
+    return lock
+
+def with_chat_lock(func):
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
+        if update.effective_chat is None:
+            return await func(update, context, *args, **kwargs)
+        async with get_chat_lock(update.effective_chat.id):
+            return await func(update, context, *args, **kwargs)
+    return wrapper
+
+# --- Pending Mods Counter Cache ---
+# The main menu shows the number of pending suggestions on every render; keep it in memory
+# and only fall back to a COUNT(*) query once the cached value is older than the TTL.
+PENDING_COUNT_TTL = 30 # seconds
+_pending_count: int = 0
+_pending_count_ts: float = 0.0
+_pending_count_lock = asyncio.Lock()
+
 # --- Helper Functions ---
 def is_owner(update: Update) -> bool:
     return update.effective_user.id == OWNER_TELEGRAM_ID
 
+# Created on first upload rather than at import; cached so later calls don't touch the filesystem
+@lru_cache(maxsize=1)
+def _ensure_upload_dir() -> str:
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    return UPLOAD_FOLDER
+
+# Blocking file helpers, run via asyncio.to_thread so disk I/O never stalls the event loop
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+# Downscale + re-encode an uploaded mod image to WebP (CPU-bound, also run via asyncio.to_thread).
+# Returns the stored filename; undecodable data is kept as-is under the fallback name.
+def _save_mod_image(upload_dir: str, basename: str, data: bytes, fallback_extension: str) -> str:
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.thumbnail(MOD_IMAGE_MAX_SIZE, Image.LANCZOS)
+            filename = f"{basename}.webp"
+            image.save(os.path.join(upload_dir, filename), "WEBP", quality=MOD_IMAGE_WEBP_QUALITY, method=6)
+            return filename
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning("Could not convert %s to WebP, storing original: %s", basename, e)
+        filename = f"{basename}{fallback_extension}"
+        _write_file(os.path.join(upload_dir, filename), data)
+        return filename
+
+# --- Request-Scoped DB Session ---
+# One app context and one Session per update: nested @with_flask_context calls (e.g. a handler
+# that ends by rendering the main menu) reuse the session instead of pushing a new context.
+_request_session: ContextVar = ContextVar("request_session", default=None)
+
+def get_request_session():
+    return _request_session.get() or db.session
+
+def close_request_session(token) -> None:
+    sess = _request_session.get()
+    try:
+        if sess is not None:
+            sess.close()
+    finally:
+        _request_session.reset(token)
+
 # Decorator to ensure Flask app context for database operations
 def with_flask_context(func):
     async def wrapper(*args, **kwargs):
+        if _request_session.get() is not None:
+            # Already inside a request scope for this update
+            return await func(*args, **kwargs)
         if FLASK_APP_AVAILABLE and flask_app:
             with flask_app.app_context():
-                return await func(*args, **kwargs)
+                token = _request_session.set(db.session())
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    close_request_session(token)
         else:
-            logger.warning(f"Flask app context not available for {func.__name__}. DB operations might fail.")
+            logger.warning("Flask app context not available for %s. DB operations might fail.", func.__name__)
             # Proceed without context if Flask app is not available (e.g. running bot standalone for testing without DB)
             # Or, handle this case more gracefully, e.g., by returning an error message to the user.
             # For now, we let it proceed, but DB calls will likely fail.
             return await func(*args, **kwargs)
     return wrapper
 
+@with_flask_context
+async def get_pending_count(force_refresh: bool = False) -> int:
+    global _pending_count, _pending_count_ts
+    if not Mod: # Check if Mod model is available
+        return 0
+    async with _pending_count_lock:
+        if force_refresh or time.monotonic() - _pending_count_ts >= PENDING_COUNT_TTL:
+            _pending_count = get_request_session().query(Mod).filter_by(status="pending_approval").count()
+            _pending_count_ts = time.monotonic()
+        return _pending_count
+
+async def adjust_pending_count(delta: int) -> None:
+    global _pending_count
+    async with _pending_count_lock:
+        _pending_count = max(0, _pending_count + delta)
+
+async def init_pending_count(application: Application) -> None:
+    try:
+        await get_pending_count(force_refresh=True)
+    except Exception as e:
+        logger.error("Error initializing pending mods count: %s", e, exc_info=True)
+
+async def on_startup(application: Application) -> None:
+    # One named, bounded pool for every asyncio.to_thread call instead of the implicit
+    # min(32, cpu + 4) default executor
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=IO_EXECUTOR_WORKERS, thread_name_prefix="bot-io"))
+    await init_pending_count(application)
+    await flush_leftover_review_decisions(application)
+
+@with_flask_context
+async def dispose_db_engine(application: Application) -> None:
+    # Release pooled DB connections once the bot shuts down
+    if FLASK_APP_AVAILABLE and db:
+        db.engine.dispose()
+
 @with_flask_context
 async def go_to_main_menu_owner(update: Update, context: ContextTypes.DEFAULT_TYPE, query_to_edit=None):
     user = update.effective_user
-    pending_mods_count = 0
-    if Mod: # Check if Mod model is available
-        pending_mods_count = Mod.query.filter_by(status=\"pending_approval\").count()
-
-    keyboard = [
-        [InlineKeyboardButton("➕ إضافة مود جديد", callback_data=\"add_mod_start\"),
-         InlineKeyboardButton("🗂️ إدارة الأقسام", callback_data=\"manage_categories_menu\ically
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    pending_mods_count = await get_pending_count()
+    reply_markup = owner_main_menu_markup(pending_mods_count)
     message_text = f"أهلاً بك يا مالك البوت! {user.first_name}\nاختر الإجراء المطلوب:"
     
-    active_query = query_to_edit or (update.callback_query if hasattr(update, \"callback_query\") and update.callback_query else None)
+    active_query = query_to_edit or (update.callback_query if hasattr(update, "callback_query") and update.callback_query else None)
 
     if active_query:
         try:
             await active_query.edit_message_text(text=message_text, reply_markup=reply_markup)
         except Exception as e:
-            logger.error(f"Error editing message for main menu: {e}")
-            if hasattr(update, \"effective_chat\") and update.effective_chat:
+            logger.error("Error editing message for main menu: %s", e, exc_info=True)
+            if hasattr(update, "effective_chat") and update.effective_chat:
                  await context.bot.send_message(chat_id=update.effective_chat.id, text=message_text, reply_markup=reply_markup)
             else: 
                  logger.warning("Could not send main menu as new message after edit failed.")
-    elif hasattr(update, \"message\") and update.message:
+    elif hasattr(update, "message") and update.message:
         await update.message.reply_text(text=message_text, reply_markup=reply_markup)
 
+# Send a mod's image, preferring the cached Telegram file_id (no upload) over the file on disk
+# `mod` is a dict holding at least "id", "image_filename" and "telegram_file_id"
+async def send_mod_photo(context: ContextTypes.DEFAULT_TYPE, chat_id: int, mod: dict) -> None:
+    try:
+        if mod["telegram_file_id"]:
+            await context.bot.send_photo(chat_id=chat_id, photo=mod["telegram_file_id"])
+            return
+        if not mod["image_filename"]:
+            return
+        # First upload only: the bytes go to Telegram through httpx over TLS, so there is no plain
+        # socket for os.sendfile() and PTB buffers the file anyway. Read it off-loop in one go.
+        image_full_path = os.path.join(UPLOAD_FOLDER, mod["image_filename"])
+        try:
+            image_data = await asyncio.to_thread(_read_file, image_full_path)
+        except FileNotFoundError:
+            logger.warning("Image file for mod %s not found: %s", mod["id"], image_full_path)
+            return
+        sent = await context.bot.send_photo(chat_id=chat_id, photo=image_data)
+        # Remember the file_id so later sends skip the upload
+        mod["telegram_file_id"] = sent.photo[-1].file_id
+        if Mod:
+            sess = get_request_session()
+            sess.query(Mod).filter_by(id=mod["id"]).update({"telegram_file_id": mod["telegram_file_id"]})
+            sess.commit()
+    except Exception as e:
+        logger.error("Error sending photo for mod %s: %s", mod["id"], e, exc_info=True)
+
+# "Back to main menu" buttons. Inside a conversation this also ends it; registered top-level too,
+# so taps on old menu messages outside any conversation are still answered.
+@owner_only
+async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+    await go_to_main_menu_owner(update, context, query_to_edit=query)
+    return ConversationHandler.END
+
 # --- Command Handlers ---
 @with_flask_context
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.effective_user
     if is_owner(update):
         if Admin and db: # Check if Admin model and db are available
-            owner_db = Admin.query.filter_by(telegram_id=OWNER_TELEGRAM_ID).first()
+            sess = get_request_session()
+            owner_db = sess.query(Admin).filter_by(telegram_id=OWNER_TELEGRAM_ID).first()
             if not owner_db:
-                new_owner = Admin(telegram_id=OWNER_TELEGRAM_ID, role=\"owner\", username=user.username or str(OWNER_TELEGRAM_ID))
-                db.session.add(new_owner)
-                db.session.commit()
+                new_owner = Admin(telegram_id=OWNER_TELEGRAM_ID, role="owner", username=user.username or str(OWNER_TELEGRAM_ID))
+                sess.add(new_owner)
+                sess.commit()
         await go_to_main_menu_owner(update, context)
     else:
-        keyboard = [[InlineKeyboardButton("💡 اقتراح مود جديد", callback_data=\"suggest_new_mod_start\")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
         await update.message.reply_text(
             f"أهلاً بك {user.first_name} في بوت نشر المودات!\nيمكنك اقتراح مود جديد ليتم إضافته إلى الموقع.",
-            reply_markup=reply_markup
+            reply_markup=USER_START_MARKUP
         )
     return ConversationHandler.END
 
+# A restored conversation state can outlive its scratch data in user_data (e.g. missing after a
+# restart); end the conversation cleanly instead of failing every later message with KeyError.
+async def _end_expired_conversation(update: Update) -> int:
+    if update.callback_query:
+        await update.callback_query.edit_message_text(SESSION_EXPIRED_TEXT)
+    elif update.effective_message:
+        await update.effective_message.reply_text(SESSION_EXPIRED_TEXT)
+    return ConversationHandler.END
+
 # --- Generic Mod Input Functions (for Owner Add & User Suggest) ---
 async def _get_mod_name(update: Update, context: ContextTypes.DEFAULT_TYPE, for_suggestion: bool) -> int:
     state_key = "suggested_mod" if for_suggestion else "current_mod"
-    context.user_data[state_key]["name"] = update.message.text
-    await update.message.reply_text("تم حفظ الاسم. يرجى إرسال **وصف المود**:", parse_mode=\"Markdown\")
+    context.user_data.setdefault(state_key, {})["name"] = update.message.text # First step; nothing to lose yet
+    await update.message.reply_text("تم حفظ الاسم. يرجى إرسال **وصف المود**:", parse_mode="Markdown")
     return SUGGEST_MOD_DESCRIPTION if for_suggestion else ADD_MOD_DESCRIPTION
 
 async def _get_mod_description(update: Update, context: ContextTypes.DEFAULT_TYPE, for_suggestion: bool) -> int:
     state_key = "suggested_mod" if for_suggestion else "current_mod"
+    if state_key not in context.user_data:
+        return await _end_expired_conversation(update)
     context.user_data[state_key]["description"] = update.message.text
-    await update.message.reply_text("تم حفظ الوصف. يرجى إرسال **رابط تحميل المود**:", parse_mode=\"Markdown\")
+    await update.message.reply_text("تم حفظ الوصف. يرجى إرسال **رابط تحميل المود**:", parse_mode="Markdown")
     return SUGGEST_MOD_LINK if for_suggestion else ADD_MOD_LINK
 
 async def _get_mod_link(update: Update, context: ContextTypes.DEFAULT_TYPE, for_suggestion: bool) -> int:
     state_key = "suggested_mod" if for_suggestion else "current_mod"
+    if state_key not in context.user_data:
+        return await _end_expired_conversation(update)
     context.user_data[state_key]["download_link"] = update.message.text
-    await update.message.reply_text("تم حفظ الرابط. يرجى إرسال **صورة للمود**:", parse_mode=\"Markdown\")
+    await update.message.reply_text("تم حفظ الرابط. يرجى إرسال **صورة للمود**:", parse_mode="Markdown")
     return SUGGEST_MOD_IMAGE if for_suggestion else ADD_MOD_IMAGE
 
 async def _get_mod_image(update: Update, context: ContextTypes.DEFAULT_TYPE, for_suggestion: bool) -> int:
-    state_key = "suggested_mod" if for_suggestion else "current_mod"
-    photo_file = await update.message.photo[-1].get_file()
-    file_extension = os.path.splitext(photo_file.file_path)[1] if photo_file.file_path else ".jpg"
-    image_filename = f"mod_{update.message.message_id}_{photo_file.file_unique_id}{file_extension}"
-    image_path = os.path.join(UPLOAD_FOLDER, image_filename)
-    await photo_file.download_to_drive(image_path)
-    context.user_data[state_key]["image_filename"] = image_filename
-    mod_info = context.user_data[state_key]
-    action_text = "اقتراح" if for_suggestion else "إضافة"
-    confirm_callback_yes = \"confirm_suggest_mod_yes\" if for_suggestion else \"confirm_add_mod_yes\"
-    confirm_callback_cancel = \"confirm_suggest_mod_cancel\" if for_suggestion else \"confirm_add_mod_cancel\"
-    text = (f"**تفاصيل المود ال{action_text}:**\n"
-            f"الاسم: {mod_info[\"name\"]}\n"
-            f"الوصف: {mod_info[\"description\"]}\n"
-            f"الرابط: {mod_info[\"download_link\"]}\n"
-            f"الصورة: {mod_info[\"image_filename\"]} (تم الحفظ)\n\n"
-            f"هل تريد تأكيد {action_text} هذا المود؟")
-    keyboard = [
-        [InlineKeyboardButton(f"✅ نعم، {action_text}", callback_data=confirm_callback_yes)],
-        [InlineKeyboardButton(f"❌ لا، إلغاء", callback_data=confirm_callback_cancel)]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(text, reply_markup=reply_markup, parse_mode=\"Markdown\")
+    # Downloading and converting the photo runs as a background task so this handler returns at once;
+    # the confirmation is posted when the image is stored. A photo sent while confirming replaces it.
+    # Not wrapped in with_chat_lock: this runs in the (sequential) dispatcher, and the save task holds
+    # the chat lock for the whole download; _store_mod_image takes it, which keeps saves in order.
+    if ("suggested_mod" if for_suggestion else "current_mod") not in context.user_data:
+        return await _end_expired_conversation(update)
+    await update.message.reply_text("جاري حفظ الصورة…")
+    context.application.create_task(
+        _store_mod_image(context, update.effective_chat.id, update.message.message_id,
+                         update.message.photo[-1], for_suggestion),
+        update=update)
     return SUGGEST_MOD_CONFIRM if for_suggestion else ADD_MOD_CONFIRM
 
+async def _store_mod_image(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int, photo, for_suggestion: bool) -> None:
+    state_key = "suggested_mod" if for_suggestion else "current_mod"
+    async with get_chat_lock(chat_id): # Keep this chat's updates and image saves in order
+        try:
+            photo_file = await photo.get_file()
+            file_extension = os.path.splitext(photo_file.file_path)[1] if photo_file.file_path else ".jpg"
+            image_basename = f"mod_{message_id}_{photo_file.file_unique_id}"
+            image_data = await photo_file.download_as_bytearray()
+            image_filename = await asyncio.to_thread(_save_mod_image, _ensure_upload_dir(), image_basename, bytes(image_data), file_extension)
+        except Exception as e:
+            logger.error("Error storing mod image for chat %s: %s", chat_id, e, exc_info=True)
+            await context.bot.send_message(chat_id=chat_id, text="حدث خطأ أثناء حفظ الصورة. يرجى إرسالها مرة أخرى.")
+            return
+        mod_info = context.user_data.get(state_key)
+        if mod_info is None: # Conversation ended (cancelled/timed out) while downloading
+            return
+        mod_info["image_filename"] = image_filename
+        mod_info["telegram_file_id"] = photo.file_id
+        text = MOD_CONFIRM_TEMPLATE.format(
+            action=MOD_ACTION_TEXT[for_suggestion], name=mod_info["name"], description=mod_info["description"],
+            download_link=mod_info["download_link"], image_filename=mod_info["image_filename"])
+        await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=MOD_CONFIRM_MARKUPS[for_suggestion], parse_mode="Markdown")
+
 # --- Add Mod Conversation (Owner) ---
+@owner_only
 @with_flask_context
 async def add_mod_start_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    if not is_owner(update):
-        await query.edit_message_text(text="عذراً، هذا الإجراء مخصص للمالك فقط.")
-        return ConversationHandler.END
     context.user_data["current_mod"] = {}
-    await query.edit_message_text(text="يرجى إرسال **اسم المود**:", parse_mode=\"Markdown\")
+    await query.edit_message_text(text="يرجى إرسال **اسم المود**:", parse_mode="Markdown")
     return ADD_MOD_NAME
 
-async def get_owner_mod_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int: return await _get_mod_name(update, context, False)
-async def get_owner_mod_description(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int: return await _get_mod_description(update, context, False)
-async def get_owner_mod_link(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int: return await _get_mod_link(update, context, False)
-async def get_owner_mod_image(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int: return await _get_mod_image(update, context, False)
-
 @with_flask_context
 async def confirm_add_mod_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    if query.data == \"confirm_add_mod_yes\":
-        mod_data = context.user_data["current_mod"]
+    if query.data == "confirm_add_mod_yes":
+        mod_data = context.user_data.get("current_mod")
+        if mod_data is None:
+            return await _end_expired_conversation(update)
         if not Mod or not db: # Check if Mod and db are available
             await query.edit_message_text(text="خطأ في الاتصال بقاعدة البيانات.")
             return ConversationHandler.END
+        sess = get_request_session()
         try:
             new_mod = Mod(
-                name=mod_data[\"name\"], description=mod_data[\"description\"],
-                download_link=mod_data[\"download_link\"], image_filename=mod_data[\"image_filename\"],
-                uploader_telegram_id=OWNER_TELEGRAM_ID, status=\"approved\"
+                name=mod_data["name"], description=mod_data["description"],
+                download_link=mod_data["download_link"], image_filename=mod_data["image_filename"],
+                telegram_file_id=mod_data.get("telegram_file_id"),
+                uploader_telegram_id=OWNER_TELEGRAM_ID, status="approved"
             )
-            db.session.add(new_mod)
-            db.session.commit()
-            await query.edit_message_text(text=f"✅ تم إضافة المود \"{mod_data[\"name\"]}\" بنجاح!")
+            sess.add(new_mod)
+            sess.commit()
+            caches.bump_content_version()
+            await query.edit_message_text(text=f"✅ تم إضافة المود \"{mod_data['name']}\" بنجاح!")
         except Exception as e:
-            logger.error(f"Error adding mod to DB: {e}")
+            sess.rollback() # The menu's pending-count query reuses this session
+            logger.error("Error adding mod to DB: %s", e, exc_info=True)
             await query.edit_message_text(text="حدث خطأ أثناء إضافة المود إلى قاعدة البيانات.")
     else:
         await query.edit_message_text(text="تم إلغاء عملية إضافة المود.")
@@ -226,78 +529,95 @@ async def suggest_new_mod_start_callback(update: Update, context: ContextTypes.D
     query = update.callback_query
     await query.answer()
     context.user_data["suggested_mod"] = {}
-    await query.edit_message_text(text="لإقتراح مود، يرجى إرسال **اسم المود**:", parse_mode=\"Markdown\")
+    await query.edit_message_text(text="لإقتراح مود، يرجى إرسال **اسم المود**:", parse_mode="Markdown")
     return SUGGEST_MOD_NAME
 
-async def get_user_mod_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int: return await _get_mod_name(update, context, True)
-async def get_user_mod_description(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int: return await _get_mod_description(update, context, True)
-async def get_user_mod_link(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int: return await _get_mod_link(update, context, True)
-async def get_user_mod_image(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int: return await _get_mod_image(update, context, True)
-
 @with_flask_context
 async def confirm_suggest_mod_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     user = update.effective_user
     await query.answer()
-    if query.data == \"confirm_suggest_mod_yes\":
-        mod_data = context.user_data["suggested_mod"]
+    if query.data == "confirm_suggest_mod_yes":
+        mod_data = context.user_data.get("suggested_mod")
+        if mod_data is None:
+            return await _end_expired_conversation(update)
         if not Mod or not db: # Check if Mod and db are available
             await query.edit_message_text(text="خطأ في الاتصال بقاعدة البيانات.")
             return ConversationHandler.END
+        sess = get_request_session()
         try:
             new_mod_suggestion = Mod(
-                name=mod_data[\"name\"], description=mod_data[\"description\"],
-                download_link=mod_data[\"download_link\"], image_filename=mod_data[\"image_filename\"],
-                uploader_telegram_id=user.id, status=\"pending_approval\"
+                name=mod_data["name"], description=mod_data["description"],
+                download_link=mod_data["download_link"], image_filename=mod_data["image_filename"],
+                telegram_file_id=mod_data.get("telegram_file_id"),
+                uploader_telegram_id=user.id, status="pending_approval"
             )
-            db.session.add(new_mod_suggestion)
-            db.session.commit()
-            await query.edit_message_text(text=f"✅ شكراً لك! تم استلام اقتراحك للمود \"{mod_data[\"name\"]}\" وسيتم مراجعته.")
-            owner_message = (f"🔔 اقتراح مود جديد من المستخدم {user.first_name} (ID: {user.id}):\n"
-                             f"الاسم: {mod_data[\"name\"]}\nالوصف: {mod_data[\"description\"]}\n"
-                             f"الرابط: {mod_data[\"download_link\"]}\nالصورة: {mod_data[\"image_filename\"]}")
-            await context.bot.send_message(chat_id=OWNER_TELEGRAM_ID, text=owner_message)
+            sess.add(new_mod_suggestion)
+            sess.commit()
+            await adjust_pending_count(+1)
         except Exception as e:
-            logger.error(f"Error saving mod suggestion to DB: {e}")
+            sess.rollback() # The menu's pending-count query reuses this session
+            logger.error("Error saving mod suggestion to DB: %s", e, exc_info=True)
             await query.edit_message_text(text="حدث خطأ أثناء حفظ اقتراحك.")
+        else:
+            owner_message = (f"🔔 اقتراح مود جديد من المستخدم {user.first_name} (ID: {user.id}):\n"
+                             f"الاسم: {mod_data['name']}\nالوصف: {mod_data['description']}\n"
+                             f"الرابط: {mod_data['download_link']}\nالصورة: {mod_data['image_filename']}")
+            # Confirming to the user and notifying the owner are independent; send both at once
+            edit_result, notify_result = await asyncio.gather(
+                query.edit_message_text(text=f"✅ شكراً لك! تم استلام اقتراحك للمود \"{mod_data['name']}\" وسيتم مراجعته."),
+                context.bot.send_message(chat_id=OWNER_TELEGRAM_ID, text=owner_message),
+                return_exceptions=True,
+            )
+            if isinstance(edit_result, Exception):
+                logger.error("Error confirming mod suggestion to user %s: %s", user.id, edit_result, exc_info=edit_result)
+            if isinstance(notify_result, Exception):
+                logger.warning("Could not notify owner about new suggestion: %s", notify_result)
     else:
         await query.edit_message_text(text="تم إلغاء عملية اقتراح المود.")
     context.user_data.pop("suggested_mod", None)
     return ConversationHandler.END
 
 # --- Review Suggested Mods (Owner) ---
+@owner_only
 @with_flask_context
 async def review_suggested_mods_start_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    if not is_owner(update):
-        await query.edit_message_text(text="عذراً، هذا الإجراء مخصص للمالك فقط.")
-        return ConversationHandler.END
-
     if not Mod: # Check if Mod model is available
         await query.edit_message_text(text="خطأ: نموذج المودات غير متوفر.")
         return ConversationHandler.END
         
-    pending_mods = Mod.query.filter_by(status=\"pending_approval\").order_by(Mod.created_at.asc()).all()
+    await flush_review_decisions(context) # Leftovers from a review that ended without being saved
+
+    # Load everything the review screens need in one query; stepping through the list needs no DB calls
+    pending_mods = (get_request_session().query(Mod)
+                    .filter_by(status="pending_approval")
+                    .order_by(Mod.created_at.asc())
+                    .with_entities(Mod.id, Mod.name, Mod.description, Mod.download_link,
+                                   Mod.image_filename, Mod.telegram_file_id, Mod.uploader_telegram_id)
+                    .all())
     
     if not pending_mods:
         await query.edit_message_text(text="لا توجد مودات مقترحة للمراجعة حالياً.")
         await go_to_main_menu_owner(update, context, query_to_edit=query)
         return ConversationHandler.END
 
-    context.user_data[\"pending_mods_list\"] = [mod.id for mod in pending_mods]
-    context.user_data[\"current_review_index\"] = 0
+    context.user_data["pending_mods"] = [dict(row._mapping) for row in pending_mods]
+    context.user_data["current_review_index"] = 0
     
     return await display_pending_mod_for_review(update, context, query_to_edit=query)
 
 @with_flask_context
 async def display_pending_mod_for_review(update: Update, context: ContextTypes.DEFAULT_TYPE, query_to_edit=None) -> int:
-    idx = context.user_data.get(\"current_review_index\", 0)
-    pending_ids = context.user_data.get(\"pending_mods_list\", [])
+    idx = context.user_data.get("current_review_index", 0)
+    pending_mods = context.user_data.get("pending_mods", [])
 
-    if idx >= len(pending_ids):
-        message_text = "لا توجد مودات مقترحة أخرى للمراجعة."
-        active_query_for_edit = query_to_edit or (update.callback_query if hasattr(update, \"callback_query\") and update.callback_query else None)
+    if idx >= len(pending_mods):
+        message_text = "لا توجد مودات مقترحة أخرى للمراجعة. تم حفظ قرارات المراجعة ونشر المودات الموافق عليها."
+        if not await flush_review_decisions(context):
+            message_text = "حدث خطأ أثناء حفظ قرارات المراجعة، سيتم إعادة المحاولة لاحقاً."
+        active_query_for_edit = query_to_edit or (update.callback_query if hasattr(update, "callback_query") and update.callback_query else None)
         if active_query_for_edit:
             await active_query_for_edit.edit_message_text(text=message_text)
         # else: # If no query, maybe send a new message or log
@@ -305,53 +625,38 @@ async def display_pending_mod_for_review(update: Update, context: ContextTypes.D
         await go_to_main_menu_owner(update, context, query_to_edit=active_query_for_edit)
         return ConversationHandler.END
 
-    mod_id = pending_ids[idx]
-    if not Mod: # Check if Mod model is available
-        # Handle error appropriately, maybe edit message or send new one
-        return ConversationHandler.END
-        
-    mod_to_review = Mod.query.get(mod_id)
-
-    if not mod_to_review:
-        error_message = "خطأ: لم يتم العثور على المود المقترح."
-        active_query_for_edit = query_to_edit or (update.callback_query if hasattr(update, \"callback_query\") and update.callback_query else None)
-        if active_query_for_edit:
-            await active_query_for_edit.edit_message_text(text=error_message)
-        await go_to_main_menu_owner(update, context, query_to_edit=active_query_for_edit)
-        return ConversationHandler.END
-
-    context.user_data[\"current_review_mod_id\"] = mod_id
-    uploader_info = f" (المقترح: {mod_to_review.uploader_telegram_id})"
-    text = (f"**مراجعة مود مقترح ({idx + 1}/{len(pending_ids)}):**{uploader_info}\n"
-            f"الاسم: {mod_to_review.name}\n"
-            f"الوصف: {mod_to_review.description}\n"
-            f"الرابط: {mod_to_review.download_link}\n"
-            f"الصورة: {mod_to_review.image_filename}")
+    mod_to_review = pending_mods[idx]
+    mod_id = mod_to_review["id"]
+    context.user_data["current_review_mod_id"] = mod_id
+    uploader_info = f" (المقترح: {mod_to_review['uploader_telegram_id']})"
+    text = (f"**مراجعة مود مقترح ({idx + 1}/{len(pending_mods)}):**{uploader_info}\n"
+            f"الاسم: {mod_to_review['name']}\n"
+            f"الوصف: {mod_to_review['description']}\n"
+            f"الرابط: {mod_to_review['download_link']}\n"
+            f"الصورة: {mod_to_review['image_filename']}")
     
     keyboard = [
-        [InlineKeyboardButton("✅ موافقة ونشر", callback_data=f\"review_action_approve_{mod_id}\")],
-        [InlineKeyboardButton("❌ رفض الاقتراح", callback_data=f\"review_action_reject_{mod_id}\")],
-        [InlineKeyboardButton("⏭️ تخطي (للمراجعة لاحقاً)", callback_data=\"review_action_skip\")],
-        [InlineKeyboardButton("🔙 القائمة الرئيسية", callback_data=\"main_menu_from_review\")]
+        [InlineKeyboardButton("✅ موافقة ونشر", callback_data=f"{REVIEW_CALLBACK_PREFIX}a:{mod_id}")],
+        [InlineKeyboardButton("❌ رفض الاقتراح", callback_data=f"{REVIEW_CALLBACK_PREFIX}r:{mod_id}")],
+        [InlineKeyboardButton("⏭️ تخطي (للمراجعة لاحقاً)", callback_data=f"{REVIEW_CALLBACK_PREFIX}s")],
+        [InlineKeyboardButton("🔙 القائمة الرئيسية", callback_data="main_menu_from_review")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    active_query = query_to_edit or (update.callback_query if hasattr(update, \"callback_query\") and update.callback_query else None)
-    # When editing, we can't send a new photo. We should send the photo first, then the text with buttons.
-    # This part needs rethinking for a better UX if image is present.
-    # For now, just sending text.
-    if active_query:
-        await active_query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode=\"Markdown\")
-    elif hasattr(update, \"effective_chat\") and update.effective_chat:
-        # This case might not be hit often if we always come from a callback query
-        if mod_to_review.image_filename:
-            image_full_path = os.path.join(UPLOAD_FOLDER, mod_to_review.image_filename)
-            if os.path.exists(image_full_path):
-                try:
-                    await context.bot.send_photo(chat_id=update.effective_chat.id, photo=open(image_full_path, \"rb\"))
-                except Exception as e:
-                    logger.error(f"Error sending photo for review: {e}")
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=text, reply_markup=reply_markup, parse_mode=\"Markdown\")
+    active_query = query_to_edit or (update.callback_query if hasattr(update, "callback_query") and update.callback_query else None)
+    has_image = bool(mod_to_review.get("telegram_file_id") or mod_to_review.get("image_filename"))
+    if active_query and not has_image:
+        await active_query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="Markdown")
+    elif hasattr(update, "effective_chat") and update.effective_chat:
+        # A photo can't be added to the message being edited: retire that message's buttons, then send
+        # the photo (by cached file_id when possible) and the review text with buttons below it
+        if active_query:
+            try:
+                await active_query.edit_message_reply_markup(reply_markup=None)
+            except BadRequest: # Already has no buttons (e.g. replaced by the decision text)
+                pass
+        await send_mod_photo(context, update.effective_chat.id, mod_to_review)
+        await context.bot.send_message(chat_id=update.effective_chat.id, text=text, reply_markup=reply_markup, parse_mode="Markdown")
 
     return REVIEW_MOD_ACTION
 
@@ -365,76 +670,102 @@ async def review_action_callback(update: Update, context: ContextTypes.DEFAULT_T
         await query.edit_message_text(text="خطأ في الاتصال بقاعدة البيانات.")
         return ConversationHandler.END
 
-    if action_data == \"review_action_skip\":
-        context.user_data[\"current_review_index\"] = context.user_data.get(\"current_review_index\", 0) + 1
-        return await display_pending_mod_for_review(update, context, query_to_edit=query)
-    elif action_data == \"main_menu_from_review\":
-        await go_to_main_menu_owner(update, context, query_to_edit=query)
+    verb, _, mod_id_str = action_data[len(REVIEW_CALLBACK_PREFIX):].partition(":")
+    action_type = REVIEW_ACTIONS.get(verb) if action_data.startswith(REVIEW_CALLBACK_PREFIX) else None
+    if action_type is None:
+        await query.edit_message_text("إجراء غير معروف.")
         return ConversationHandler.END
+    if action_type == "skip":
+        context.user_data["current_review_index"] = context.user_data.get("current_review_index", 0) + 1
+        return await display_pending_mod_for_review(update, context, query_to_edit=query)
 
     try:
-        action_type, mod_id_str = action_data.split(\"_\")[-2:]
         mod_id = int(mod_id_str)
-        mod_to_update = Mod.query.get(mod_id)
-
-        if not mod_to_update:
-            await query.edit_message_text("خطأ: لم يتم العثور على المود لتحديث حالته.")
-            return ConversationHandler.END # Or go to main menu
-
-        if action_type == \"approve\":
-            mod_to_update.status = \"approved\"
-            db.session.commit()
-            await query.edit_message_text(f"✅ تم الموافقة على المود \"{mod_to_update.name}\" ونشره.")
-            # Optionally notify the suggester
-            if mod_to_update.uploader_telegram_id != OWNER_TELEGRAM_ID:
-                try:
-                    await context.bot.send_message(chat_id=mod_to_update.uploader_telegram_id, text=f"🎉 تهانينا! تم الموافقة على اقتراحك للمود \"{mod_to_update.name}\" ونشره على الموقع.")
-                except Exception as e:
-                    logger.warning(f"Could not notify suggester {mod_to_update.uploader_telegram_id}: {e}")
-        elif action_type == \"reject\":
-            mod_to_update.status = \"rejected\" # Or delete it, or keep for record
-            db.session.commit()
-            await query.edit_message_text(f"❌ تم رفض المود \"{mod_to_update.name}\".")
-            # Optionally notify the suggester
-            if mod_to_update.uploader_telegram_id != OWNER_TELEGRAM_ID:
-                try:
-                    await context.bot.send_message(chat_id=mod_to_update.uploader_telegram_id, text=f"😕 نأسف لإبلاغك بأنه تم رفض اقتراحك للمود \"{mod_to_update.name}\" حالياً.")
-                except Exception as e:
-                    logger.warning(f"Could not notify suggester {mod_to_update.uploader_telegram_id}: {e}")
-        else:
-            await query.edit_message_text("إجراء غير معروف.")
-            return ConversationHandler.END
-
     except ValueError:
         await query.edit_message_text("خطأ في بيانات الإجراء.")
         return ConversationHandler.END
-    except Exception as e:
-        logger.error(f"Error processing review action: {e}")
-        await query.edit_message_text("حدث خطأ أثناء معالجة الإجراء.")
-        return ConversationHandler.END
+
+    mod_to_update = next((m for m in context.user_data.get("pending_mods", []) if m["id"] == mod_id), None)
+    if not mod_to_update:
+        await query.edit_message_text("خطأ: لم يتم العثور على المود لتحديث حالته.")
+        return ConversationHandler.END # Or go to main menu
+
+    # Only record the decision here; flush_review_decisions() writes the whole batch at once
+    new_status = "approved" if action_type == "approve" else "rejected" # Or delete it, or keep for record
+    decisions = context.user_data.setdefault("pending_updates", {})
+    decisions[mod_id] = {"id": mod_id, "status": new_status, "name": mod_to_update["name"],
+                         "uploader_telegram_id": mod_to_update["uploader_telegram_id"]}
+    # Nothing is published yet; say so instead of claiming it is live
+    if new_status == "approved":
+        owner_text = f"✅ تم تسجيل الموافقة على المود \"{mod_to_update['name']}\"، وسيتم نشره عند انتهاء المراجعة."
+    else:
+        owner_text = f"❌ تم تسجيل رفض المود \"{mod_to_update['name']}\"، وسيتم حفظه عند انتهاء المراجعة."
+    await query.edit_message_text(owner_text)
+    if len(decisions) >= REVIEW_FLUSH_BATCH_SIZE:
+        await flush_review_decisions(context)
 
     # Move to the next mod or end review
-    context.user_data[\"current_review_index\"] = context.user_data.get(\"current_review_index\", 0) + 1
+    context.user_data["current_review_index"] = context.user_data.get("current_review_index", 0) + 1
     return await display_pending_mod_for_review(update, context, query_to_edit=query)
 
+# Write all recorded review decisions in one transaction, then notify the suggesters.
+# Returns False (keeping the decisions for the next attempt) if the write fails.
+@with_flask_context
+async def flush_review_decisions(context: ContextTypes.DEFAULT_TYPE) -> bool:
+    decisions = context.user_data.pop("pending_updates", None)
+    if not decisions:
+        return True
+    sess = get_request_session()
+    now = datetime.utcnow()
+    try:
+        sess.bulk_update_mappings(Mod, [{"id": d["id"], "status": d["status"], "updated_at": now}
+                                        for d in decisions.values()])
+        sess.commit()
+    except Exception as e:
+        sess.rollback()
+        logger.error("Error saving %d review decisions: %s", len(decisions), e, exc_info=True)
+        context.user_data["pending_updates"] = decisions
+        return False
+    if any(d["status"] == "approved" for d in decisions.values()):
+        caches.bump_content_version() # Newly published mods
+    await adjust_pending_count(-len(decisions))
+
+    notifications = []
+    for d in decisions.values():
+        if d["uploader_telegram_id"] == OWNER_TELEGRAM_ID:
+            continue
+        if d["status"] == "approved":
+            text = f"🎉 تهانينا! تم الموافقة على اقتراحك للمود \"{d['name']}\" ونشره على الموقع."
+        else:
+            text = f"😕 نأسف لإبلاغك بأنه تم رفض اقتراحك للمود \"{d['name']}\" حالياً."
+        notifications.append((d["uploader_telegram_id"], context.bot.send_message(chat_id=d["uploader_telegram_id"], text=text)))
+    results = await asyncio.gather(*(coro for _, coro in notifications), return_exceptions=True)
+    for (suggester_id, _), result in zip(notifications, results):
+        if isinstance(result, Exception):
+            logger.warning("Could not notify suggester %s: %s", suggester_id, result)
+    return True
+
+# Decisions persisted with user_data but never written (the review timeout job doesn't survive a
+# restart) are saved, and their suggesters notified, as soon as the bot is back up.
+async def flush_leftover_review_decisions(application: Application) -> None:
+    for user_id, data in list(application.user_data.items()):
+        if data.get("pending_updates"):
+            await flush_review_decisions(application.context_types.context(application, user_id=user_id))
+
+# Fallbacks/timeout of the review conversation save the recorded decisions before leaving it
+def flushing_review_decisions(func):
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
+        await flush_review_decisions(context)
+        return await func(update, context, *args, **kwargs)
+    return wrapper
+
 # --- Category Management (Owner) ---
+@owner_only
 @with_flask_context
 async def manage_categories_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    if not is_owner(update):
-        await query.edit_message_text(text="عذراً، هذا الإجراء مخصص للمالك فقط.")
-        return ConversationHandler.END
-
-    keyboard = [
-        [InlineKeyboardButton("➕ إضافة قسم جديد", callback_data=\"add_category_start\")],
-        # [InlineKeyboardButton("✏️ تعديل قسم موجود", callback_data=\"edit_category_list\")], # TODO
-        # [InlineKeyboardButton("🗑️ حذف قسم موجود", callback_data=\"delete_category_list\")], # TODO
-        [InlineKeyboardButton("📋 عرض كل الأقسام", callback_data=\"list_all_categories\")],
-        [InlineKeyboardButton("🔙 القائمة الرئيسية", callback_data=\"main_menu_from_cat_manage\")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(text="إدارة الأقسام:", reply_markup=reply_markup)
+    await query.edit_message_text(text="إدارة الأقسام:", reply_markup=CAT_MANAGE_MARKUP)
     return CAT_MANAGE_MENU
 
 @with_flask_context
@@ -445,60 +776,54 @@ async def list_all_categories_callback(update: Update, context: ContextTypes.DEF
         await query.edit_message_text("خطأ: نموذج الأقسام غير متوفر.")
         return CAT_MANAGE_MENU
         
-    categories = Category.query.order_by(Category.name).all()
+    categories = caches.get_categories(get_request_session())
     if not categories:
         text = "لا توجد أقسام مضافة حالياً."
     else:
-        text = "**الأقسام الحالية:**\n" + "\n".join([f"- {cat.name} (ID: {cat.id})" for cat in categories])
+        text = "**الأقسام الحالية:**\n" + "\n".join(f"- {name} (ID: {cat_id})" for cat_id, name in categories)
     
     # Re-show category management menu after listing
-    keyboard = [
-        [InlineKeyboardButton("➕ إضافة قسم جديد", callback_data=\"add_category_start\")],
-        [InlineKeyboardButton("🔙 العودة لقائمة إدارة الأقسام", callback_data=\"manage_categories_menu_from_list\")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode=\"Markdown\")
+    await query.edit_message_text(text=text, reply_markup=CAT_LIST_MARKUP, parse_mode="Markdown")
     return CAT_MANAGE_MENU # Stay in category management menu
 
 async def add_category_start_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
     context.user_data["new_category"] = {}
-    await query.edit_message_text(text="يرجى إرسال **اسم القسم الجديد** الذي تريد إضافته:", parse_mode=\"Markdown\")
+    await query.edit_message_text(text="يرجى إرسال **اسم القسم الجديد** الذي تريد إضافته:", parse_mode="Markdown")
     return ADD_CAT_GET_NAME
 
 async def get_new_category_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    context.user_data["new_category"]["name"] = update.message.text
+    context.user_data.setdefault("new_category", {})["name"] = update.message.text
     cat_name = context.user_data["new_category"]["name"]
-    keyboard = [
-        [InlineKeyboardButton("✅ نعم، إضافة", callback_data=\"confirm_add_category_yes\")],
-        [InlineKeyboardButton("❌ لا، إلغاء", callback_data=\"confirm_add_category_cancel\")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(f"هل أنت متأكد أنك تريد إضافة قسم باسم \"{cat_name}\"؟", reply_markup=reply_markup)
+    await update.message.reply_text(f"هل أنت متأكد أنك تريد إضافة قسم باسم \"{cat_name}\"؟", reply_markup=CONFIRM_ADD_CATEGORY_MARKUP)
     return ADD_CAT_CONFIRM
 
 @with_flask_context
 async def confirm_add_category_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    if query.data == \"confirm_add_category_yes\":
+    if query.data == "confirm_add_category_yes":
+        if "name" not in context.user_data.get("new_category", {}):
+            return await _end_expired_conversation(update)
         cat_name = context.user_data["new_category"]["name"]
         if not Category or not db: # Check if Category and db are available
             await query.edit_message_text(text="خطأ في الاتصال بقاعدة البيانات.")
             return CAT_MANAGE_MENU
+        sess = get_request_session()
         try:
-            # Check if category already exists (case-insensitive check might be better)
-            existing_category = Category.query.filter(Category.name.ilike(cat_name)).first()
-            if existing_category:
-                await query.edit_message_text(f"⚠️ القسم \"{cat_name}\" موجود بالفعل.")
-            else:
-                new_cat = Category(name=cat_name)
-                db.session.add(new_cat)
-                db.session.commit()
-                await query.edit_message_text(f"✅ تم إضافة القسم \"{cat_name}\" بنجاح!")
+            # Duplicates (case-insensitive) are rejected by the ux_category_name_lower index
+            sess.add(Category(name=cat_name))
+            sess.commit()
+            caches.bump_categories_version()
+            caches.bump_content_version()
+            await query.edit_message_text(f"✅ تم إضافة القسم \"{cat_name}\" بنجاح!")
+        except IntegrityError:
+            sess.rollback()
+            await query.edit_message_text(f"⚠️ القسم \"{cat_name}\" موجود بالفعل.")
         except Exception as e:
-            logger.error(f"Error adding category to DB: {e}")
+            sess.rollback() # The menu's pending-count query reuses this session
+            logger.error("Error adding category to DB: %s", e, exc_info=True)
             await query.edit_message_text("حدث خطأ أثناء إضافة القسم إلى قاعدة البيانات.")
     else:
         await query.edit_message_text("تم إلغاء عملية إضافة القسم.")
@@ -508,22 +833,21 @@ async def confirm_add_category_callback(update: Update, context: ContextTypes.DE
     return CAT_MANAGE_MENU
 
 # --- View Stats (Owner) ---
+@owner_only
 @with_flask_context
 async def view_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    if not is_owner(update):
-        await query.edit_message_text(text="عذراً، هذا الإجراء مخصص للمالك فقط.")
-        return ConversationHandler.END # Or just return if not in a conversation
-
     if not Mod: # Check if Mod model is available
         await query.edit_message_text(text="خطأ: نموذج المودات غير متوفر.")
         return # Or go to main menu
 
-    total_mods = Mod.query.count()
-    approved_mods = Mod.query.filter_by(status=\"approved\").count()
-    pending_mods = Mod.query.filter_by(status=\"pending_approval\").count()
-    rejected_mods = Mod.query.filter_by(status=\"rejected\").count()
+    # One GROUP BY instead of a COUNT(*) per status
+    mods_by_status = dict(get_request_session().query(Mod.status, db.func.count(Mod.id)).group_by(Mod.status).all())
+    total_mods = sum(mods_by_status.values())
+    approved_mods = mods_by_status.get("approved", 0)
+    pending_mods = mods_by_status.get("pending_approval", 0)
+    rejected_mods = mods_by_status.get("rejected", 0)
     # total_views = db.session.query(db.func.sum(Mod.view_count)).scalar() or 0
     # total_downloads = db.session.query(db.func.sum(Mod.download_count)).scalar() or 0
 
@@ -535,10 +859,47 @@ async def view_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
                   # f"👁️ إجمالي المشاهدات: {total_views}\n"
                   # f"📥 إجمالي التنزيلات: {total_downloads}"
                   )
-    await query.edit_message_text(text=stats_text, parse_mode=\"Markdown\")
+    await query.edit_message_text(text=stats_text, parse_mode="Markdown")
     await go_to_main_menu_owner(update, context, query_to_edit=query)
     # Not in a conversation, so no state to return or ConversationHandler.END
 
+# --- Conversation Cleanup ---
+async def stamp_last_seen(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # Runs in group -1 before every other handler; lets the sweep find inactive users.
+    # Wall-clock time, since user_data is persisted across restarts.
+    if context.user_data is not None:
+        context.user_data["_last_seen"] = time.time()
+
+async def conversation_timeout_cleanup(update: Update, context: ContextTypes.DEFAULT_TYPE, keys: tuple) -> None:
+    if context.user_data is None:
+        return
+    for key in keys:
+        context.user_data.pop(key, None)
+    if update.effective_chat:
+        try:
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=SESSION_EXPIRED_TEXT)
+        except Exception as e:
+            logger.warning("Could not send session expired message: %s", e)
+
+async def prune_stale_user_data(context: ContextTypes.DEFAULT_TYPE) -> None:
+    application = context.application
+    now = time.time()
+    # Persisted conversations come back without their timeout jobs after a restart; never drop the
+    # user_data of someone whose conversation is still open (job data: the conversation names).
+    users_in_conversation = set()
+    if application.persistence:
+        for name in context.job.data or ():
+            conversations = await application.persistence.get_conversations(name)
+            users_in_conversation.update(key[-1] for key, state in conversations.items() if state is not None)
+    # Unsaved review decisions are kept until the owner's next review flushes them
+    stale_user_ids = [user_id for user_id, data in application.user_data.items()
+                      if now - data.get("_last_seen", now) > USER_DATA_TTL and not data.get("pending_updates")
+                      and user_id not in users_in_conversation]
+    for user_id in stale_user_ids:
+        application.drop_user_data(user_id)
+    if stale_user_ids:
+        logger.info("Dropped user_data of %d inactive users.", len(stale_user_ids))
+
 # --- Fallback and Error Handlers ---
 async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("عذراً، لم أفهم هذا الأمر. استخدم /start لبدء التفاعل.")
@@ -546,11 +907,40 @@ async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.error(msg="Exception while handling an update:", exc_info=context.error)
     # Optionally, notify the user or owner about the error
-    if update and hasattr(update, \"effective_message\") and update.effective_message:
+    if update and hasattr(update, "effective_message") and update.effective_message:
         try:
             await update.effective_message.reply_text("حدث خطأ ما أثناء معالجة طلبك. تم إبلاغ المطور.")
         except Exception as e:
-            logger.error(f"Error sending error message to user: {e}")
+            logger.error("Error sending error message to user: %s", e, exc_info=True)
+
+# --- Single Instance Lock ---
+_singleton_lock_handle = None # Kept open for the life of the process; closing it releases the lock
+
+def acquire_singleton_lock() -> bool:
+    global _singleton_lock_handle
+    if FLASK_APP_AVAILABLE and flask_app:
+        with flask_app.app_context():
+            engine = db.engine
+        if engine.dialect.name == "postgresql":
+            # Session-level advisory lock: released by the server as soon as this connection goes away.
+            # AUTOCOMMIT so the connection isn't left "idle in transaction" (and killed by
+            # idle_in_transaction_session_timeout or a pooler, silently releasing the lock).
+            conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            acquired = conn.exec_driver_sql(f"SELECT pg_try_advisory_lock({SINGLETON_LOCK_KEY})").scalar()
+            if not acquired:
+                conn.close()
+                return False
+            _singleton_lock_handle = conn
+            return True
+    import fcntl # POSIX only; fine for the single-host SQLite setup
+    lock_file = open(SINGLETON_LOCK_FILE, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    _singleton_lock_handle = lock_file
+    return True
 
 # --- Main Bot Setup ---
 def main() -> None:
@@ -558,19 +948,43 @@ def main() -> None:
         print("Error: TELEGRAM_BOT_TOKEN is not set in environment variables.")
         return
 
-    application = Application.builder().token(BOT_TOKEN).build()
+    if not acquire_singleton_lock():
+        logger.error("Another bot instance is already running; exiting.")
+        return
+
+    # PTB's default HTTPX pools are tiny; replies, owner notifications and suggester notifications
+    # can easily exhaust them. The rate limiter keeps us just under Telegram's ~30 msg/s bot-wide
+    # limit and retries 429s instead of failing the handler.
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .persistence(PicklePersistence(filepath=PERSISTENCE_FILE))
+        .connection_pool_size(256)
+        .pool_timeout(30)
+        .get_updates_connection_pool_size(16)
+        .get_updates_pool_timeout(30)
+        .rate_limiter(AIORateLimiter(overall_max_rate=28, max_retries=3))
+        .post_init(on_startup)
+        .post_shutdown(dispose_db_engine)
+        .build()
+    )
 
     # Conversation handler for adding a mod (owner)
     add_mod_conv_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(add_mod_start_callback, pattern=\"^add_mod_start$\")],
+        name="add_mod_conv",
+        persistent=True,
+        entry_points=[CallbackQueryHandler(add_mod_start_callback, pattern=CALLBACK_PATTERNS["add_mod_start"])],
         states={
-            ADD_MOD_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_owner_mod_name)],
-            ADD_MOD_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_owner_mod_description)],
-            ADD_MOD_LINK: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_owner_mod_link)],
-            ADD_MOD_IMAGE: [MessageHandler(filters.PHOTO, get_owner_mod_image)],
-            ADD_MOD_CONFIRM: [CallbackQueryHandler(confirm_add_mod_callback, pattern=\"^(confirm_add_mod_yes|confirm_add_mod_cancel)$\")]
+            ADD_MOD_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, partial(_get_mod_name, for_suggestion=False))],
+            ADD_MOD_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, partial(_get_mod_description, for_suggestion=False))],
+            ADD_MOD_LINK: [MessageHandler(filters.TEXT & ~filters.COMMAND, partial(_get_mod_link, for_suggestion=False))],
+            ADD_MOD_IMAGE: [MessageHandler(filters.PHOTO, partial(_get_mod_image, for_suggestion=False))],
+            ADD_MOD_CONFIRM: [CallbackQueryHandler(with_chat_lock(confirm_add_mod_callback), pattern=CALLBACK_PATTERNS["confirm_add_mod"], block=False),
+                              MessageHandler(filters.PHOTO, partial(_get_mod_image, for_suggestion=False))],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, partial(conversation_timeout_cleanup, keys=ADD_MOD_USER_DATA_KEYS))],
         },
-        fallbacks=[CommandHandler(\"start\", start_command), CallbackQueryHandler(lambda u,c: go_to_main_menu_owner(u,c,u.callback_query), pattern=\"^main_menu_\") ],
+        fallbacks=[CommandHandler("start", start_command), CallbackQueryHandler(main_menu_callback, pattern=CALLBACK_PATTERNS["main_menu"]) ],
+        conversation_timeout=CONVERSATION_TIMEOUT,
         map_to_parent={
             ConversationHandler.END: ConversationHandler.END # Go back to where it was called from, or end
         }
@@ -578,15 +992,20 @@ def main() -> None:
     
     # Conversation handler for suggesting a mod (user)
     suggest_mod_conv_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(suggest_new_mod_start_callback, pattern=\"^suggest_new_mod_start$\")],
+        name="suggest_mod_conv",
+        persistent=True,
+        entry_points=[CallbackQueryHandler(suggest_new_mod_start_callback, pattern=CALLBACK_PATTERNS["suggest_new_mod_start"])],
         states={
-            SUGGEST_MOD_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_user_mod_name)],
-            SUGGEST_MOD_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_user_mod_description)],
-            SUGGEST_MOD_LINK: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_user_mod_link)],
-            SUGGEST_MOD_IMAGE: [MessageHandler(filters.PHOTO, get_user_mod_image)],
-            SUGGEST_MOD_CONFIRM: [CallbackQueryHandler(confirm_suggest_mod_callback, pattern=\"^(confirm_suggest_mod_yes|confirm_suggest_mod_cancel)$\")]
+            SUGGEST_MOD_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, partial(_get_mod_name, for_suggestion=True))],
+            SUGGEST_MOD_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, partial(_get_mod_description, for_suggestion=True))],
+            SUGGEST_MOD_LINK: [MessageHandler(filters.TEXT & ~filters.COMMAND, partial(_get_mod_link, for_suggestion=True))],
+            SUGGEST_MOD_IMAGE: [MessageHandler(filters.PHOTO, partial(_get_mod_image, for_suggestion=True))],
+            SUGGEST_MOD_CONFIRM: [CallbackQueryHandler(with_chat_lock(confirm_suggest_mod_callback), pattern=CALLBACK_PATTERNS["confirm_suggest_mod"], block=False),
+                                  MessageHandler(filters.PHOTO, partial(_get_mod_image, for_suggestion=True))],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, partial(conversation_timeout_cleanup, keys=SUGGEST_MOD_USER_DATA_KEYS))],
         },
-        fallbacks=[CommandHandler(\"start\", start_command)],
+        fallbacks=[CommandHandler("start", start_command)],
+        conversation_timeout=CONVERSATION_TIMEOUT,
          map_to_parent={
             ConversationHandler.END: ConversationHandler.END 
         }
@@ -594,11 +1013,16 @@ def main() -> None:
 
     # Conversation handler for reviewing suggested mods (owner)
     review_mods_conv_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(review_suggested_mods_start_callback, pattern=\"^review_suggested_mods_start$\")],
+        name="review_mods_conv",
+        persistent=True,
+        entry_points=[CallbackQueryHandler(with_chat_lock(review_suggested_mods_start_callback), pattern=CALLBACK_PATTERNS["review_suggested_mods_start"], block=False)],
         states={
-            REVIEW_MOD_ACTION: [CallbackQueryHandler(review_action_callback, pattern=\"^review_action_(approve|reject|skip)_.*$\")],
+            REVIEW_MOD_ACTION: [CallbackQueryHandler(with_chat_lock(review_action_callback), pattern=CALLBACK_PATTERNS["review_action"], block=False)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, with_chat_lock(flushing_review_decisions(partial(conversation_timeout_cleanup, keys=REVIEW_USER_DATA_KEYS))))],
         },
-        fallbacks=[CallbackQueryHandler(lambda u,c: go_to_main_menu_owner(u,c,u.callback_query), pattern=\"^main_menu_from_review$\"), CommandHandler(\"start\", start_command)],
+        fallbacks=[CallbackQueryHandler(flushing_review_decisions(main_menu_callback), pattern=CALLBACK_PATTERNS["main_menu_from_review"]),
+                   CommandHandler("start", flushing_review_decisions(start_command))],
+        conversation_timeout=CONVERSATION_TIMEOUT,
         map_to_parent={
             ConversationHandler.END: ConversationHandler.END
         }
@@ -606,38 +1030,65 @@ def main() -> None:
 
     # Conversation handler for managing categories (owner)
     manage_categories_conv_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(manage_categories_menu_callback, pattern=\"^manage_categories_menu$\")],
+        name="manage_categories_conv",
+        persistent=True,
+        entry_points=[CallbackQueryHandler(manage_categories_menu_callback, pattern=CALLBACK_PATTERNS["manage_categories_menu"])],
         states={
             CAT_MANAGE_MENU: [
-                CallbackQueryHandler(add_category_start_callback, pattern=\"^add_category_start$\"),
-                CallbackQueryHandler(list_all_categories_callback, pattern=\"^list_all_categories$\"),
-                CallbackQueryHandler(lambda u,c: go_to_main_menu_owner(u,c,u.callback_query), pattern=\"^main_menu_from_cat_manage$\"),
-                CallbackQueryHandler(manage_categories_menu_callback, pattern=\"^manage_categories_menu_from_list$\") # Back to menu
+                CallbackQueryHandler(add_category_start_callback, pattern=CALLBACK_PATTERNS["add_category_start"]),
+                CallbackQueryHandler(with_chat_lock(list_all_categories_callback), pattern=CALLBACK_PATTERNS["list_all_categories"], block=False),
+                CallbackQueryHandler(main_menu_callback, pattern=CALLBACK_PATTERNS["main_menu_from_cat_manage"]),
+                CallbackQueryHandler(manage_categories_menu_callback, pattern=CALLBACK_PATTERNS["manage_categories_menu_from_list"]) # Back to menu
             ],
             ADD_CAT_GET_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_new_category_name)],
-            ADD_CAT_CONFIRM: [CallbackQueryHandler(confirm_add_category_callback, pattern=\"^(confirm_add_category_yes|confirm_add_category_cancel)$\")]
+            ADD_CAT_CONFIRM: [CallbackQueryHandler(with_chat_lock(confirm_add_category_callback), pattern=CALLBACK_PATTERNS["confirm_add_category"], block=False)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, partial(conversation_timeout_cleanup, keys=CATEGORY_USER_DATA_KEYS))],
             # TODO: Add states for edit/delete category if implemented
         },
-        fallbacks=[CommandHandler(\"start\", start_command), CallbackQueryHandler(lambda u,c: go_to_main_menu_owner(u,c,u.callback_query), pattern=\"^main_menu_\") ],
+        fallbacks=[CommandHandler("start", start_command), CallbackQueryHandler(main_menu_callback, pattern=CALLBACK_PATTERNS["main_menu"]) ],
+        conversation_timeout=CONVERSATION_TIMEOUT,
          map_to_parent={
             ConversationHandler.END: ConversationHandler.END
         }
     )
 
-    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(TypeHandler(Update, stamp_last_seen), group=-1)
     application.add_handler(add_mod_conv_handler)
     application.add_handler(suggest_mod_conv_handler)
     application.add_handler(review_mods_conv_handler)
     application.add_handler(manage_categories_conv_handler)
-    application.add_handler(CallbackQueryHandler(view_stats_callback, pattern=\"^view_stats$\"))
+    # After the conversations, so their /start fallbacks (which end them, and flush review decisions) see it first
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CallbackQueryHandler(with_chat_lock(view_stats_callback), pattern=CALLBACK_PATTERNS["view_stats"], block=False))
+    # Main-menu taps that no active conversation claimed
+    application.add_handler(CallbackQueryHandler(main_menu_callback, pattern=CALLBACK_PATTERNS["main_menu"], block=False))
     
     # Fallback for unknown commands/messages
-    application.add_handler(MessageHandler(filters.COMMAND, unknown_command))
+    application.add_handler(MessageHandler(filters.COMMAND, unknown_command, block=False))
 
     application.add_error_handler(error_handler)
 
-    logger.info("Bot starting...")
-    application.run_polling()
+    if application.job_queue:
+        conversation_names = [handler.name for handler in (add_mod_conv_handler, suggest_mod_conv_handler,
+                                                           review_mods_conv_handler, manage_categories_conv_handler)]
+        application.job_queue.run_repeating(prune_stale_user_data, interval=USER_DATA_PRUNE_INTERVAL, data=conversation_names)
+    else:
+        logger.warning("JobQueue not available; stale user_data will not be pruned and conversations will not time out.")
+
+    if WEBHOOK_URL:
+        # PTB's webhook server answers Telegram with 200 as soon as the update is queued;
+        # the update itself is processed afterwards by the application.
+        logger.info("Bot starting in webhook mode on port %s...", WEBHOOK_PORT)
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+        )
+    else:
+        logger.info("Bot starting in polling mode (TELEGRAM_WEBHOOK_URL not set)...")
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,62 @@
+import threading
+import time
+
+# In-process cache versioning shared by the website routes and the bot handlers.
+# Writers bump the version after changing public content; readers include it in their cache keys
+# so stale entries are never served again by this process. Bumps don't cross processes: with the bot
+# and the website deployed separately, the bot's bumps only matter when both share one process, and
+# the website's short TTLs (30s) bound how stale its pages and category list can get.
+_content_version = 0
+
+def content_version():
+    return _content_version
+
+def bump_content_version():
+    global _content_version
+    _content_version += 1
+
+# --- Categories ---
+# Categories only change through the bot's add-category flow, so keep one ordered (id, name) list
+# per process and rebuild it only after a write. Writes made by the other process (the bot adds
+# categories, the website serves them) are covered by the TTL, kept equal to the 30s page cache TTL,
+# and by get_category() reloading once when asked for an id it doesn't know yet.
+CATEGORIES_TTL = 30 # seconds
+_categories_version = 0
+_categories_cache = None # (version, loaded_at, rows, rows_by_id)
+_categories_lock = threading.Lock()
+
+def bump_categories_version():
+    global _categories_version
+    _categories_version += 1
+
+def _load_categories(session):
+    from .extensions import db
+    from .models.category import Category
+    session = session or db.session
+    # Plain rows (not ORM objects) so they can be shared across sessions/threads safely
+    rows = session.query(Category).with_entities(Category.id, Category.name).order_by(Category.name).all()
+    return tuple(rows)
+
+def _categories_entry(session=None, force_refresh=False):
+    global _categories_cache
+    entry = _categories_cache
+    if not force_refresh and entry is not None and entry[0] == _categories_version and time.monotonic() - entry[1] < CATEGORIES_TTL:
+        return entry
+    with _categories_lock:
+        entry = _categories_cache
+        if force_refresh or entry is None or entry[0] != _categories_version or time.monotonic() - entry[1] >= CATEGORIES_TTL:
+            version = _categories_version # read before loading so a concurrent bump forces another rebuild
+            rows = _load_categories(session)
+            entry = (version, time.monotonic(), rows, {row.id: row for row in rows})
+            _categories_cache = entry
+    return entry
+
+def get_categories(session=None):
+    return _categories_entry(session)[2]
+
+def get_category(category_id, session=None):
+    category = _categories_entry(session)[3].get(category_id)
+    if category is None:
+        # Possibly added by the other process since the last load
+        category = _categories_entry(session, force_refresh=True)[3].get(category_id)
+    return category
@@ -1,4 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 
-db = SQLAlchemy()
-
+# Sessions don't autoflush before every query (writes here flush on commit anyway) and keep loaded
+# attributes after commit instead of re-SELECTing them on next access.
+db = SQLAlchemy(session_options={'autoflush': False, 'expire_on_commit': False})
+migrate = Migrate()
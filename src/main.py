@@ -1,12 +1,17 @@
 import os
 import sys
 from datetime import datetime
+from functools import lru_cache
 from flask import Flask
+from sqlalchemy import event
+from alembic import command
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
 
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from src.extensions import db # Import db from extensions
+from src.extensions import db, migrate # Import db from extensions
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'a_very_secret_random_key_for_minecraft_mods_website')
@@ -15,30 +20,66 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'a_very_secret_random_key_for
 # otherwise, fall back to local SQLite.
 project_root = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 DATABASE_URL = os.getenv('DATABASE_URL')
-if DATABASE_URL and DATABASE_URL.startswith("postgres"): # Render provides postgresql://
+USING_SQLITE = not (DATABASE_URL and DATABASE_URL.startswith("postgres"))
+# Room for every distinct statement shape the website and bot issue in the compiled-SQL cache (default 500)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'query_cache_size': 1200}
+if not USING_SQLITE: # Render provides postgresql://
     app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+    # Pooled connections shared by web requests; pre_ping/recycle drop connections the server closed
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'pool_size': 20,
+        'max_overflow': 40,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    })
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(project_root, 'minecraft_mods_website.db')
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Set when a front server that honours X-Sendfile (Apache, or nginx via X-Accel) serves the files;
+# Flask then only sends headers instead of streaming the file body itself.
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
 
 db.init_app(app)
+migrate.init_app(app, db, directory=os.path.join(project_root, 'migrations'))
+
+# SQLite fallback: WAL lets readers (web) and the writer (bot) work at the same time
+# instead of blocking on the database file lock.
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+if USING_SQLITE:
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
 
 # Custom Jinja filter for datetime formatting
-def datetimeformat(value, format='%Y-%m-%d %H:%M'):
-    if isinstance(value, str):
+# Stored date strings come in a couple of fixed shapes, so pick the parser from the length up front
+# instead of trying parsers until one stops raising.
+_DATETIME_STRING_FORMATS = {26: '%Y-%m-%d %H:%M:%S.%f', 19: '%Y-%m-%d %H:%M:%S'}
+
+@lru_cache(maxsize=4096) # the same few timestamps repeat across a page
+def _format_datetime_string(value, format):
+    fmt = _DATETIME_STRING_FORMATS.get(len(value))
+    parsed = None
+    if fmt and value[10:11] == ' ':
         try:
-            value = datetime.fromisoformat(value)
+            parsed = datetime.strptime(value, fmt)
         except ValueError:
-            # If it's not ISO format, try to parse it if it's already a common string format
-            # This part might need adjustment based on how dates are stored/retrieved
-            try:
-                value = datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f') # Example format
-            except ValueError:
-                try:
-                    value = datetime.strptime(value, '%Y-%m-%d %H:%M:%S') # Example format without microseconds
-                except ValueError:
-                     return value # Return as is if parsing fails
+            pass # Same length but another shape (e.g. with a UTC offset); fromisoformat handles those
+    if parsed is None:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return value # Return as is if parsing fails
+    return parsed.strftime(format)
+
+def datetimeformat(value, format='%Y-%m-%d %H:%M'):
+    if isinstance(value, str):
+        return _format_datetime_string(value, format)
     if isinstance(value, datetime):
         return value.strftime(format)
     return value
@@ -46,7 +87,7 @@ def datetimeformat(value, format='%Y-%m-%d %H:%M'):
 app.jinja_env.filters['datetimeformat'] = datetimeformat
 
 # Import models here after db is initialized and app is configured
-# These imports are necessary for db.create_all() to know about the models
+# These imports register the models on db.metadata (used by Alembic autogenerate)
 from src.models.mod import Mod
 from src.models.category import Category
 from src.models.admin import Admin
@@ -59,6 +100,7 @@ app.register_blueprint(main_routes)
 static_uploads_mods_images_folder = os.path.join(app.static_folder, 'uploads', 'mods_images')
 if not os.path.exists(static_uploads_mods_images_folder):
     os.makedirs(static_uploads_mods_images_folder, exist_ok=True)
+app.config['MOD_IMAGES_FOLDER'] = static_uploads_mods_images_folder # served by main_routes.mod_image
 
 # Placeholder image creation (for local dev)
 static_images_folder = os.path.join(app.static_folder, 'images')
@@ -75,32 +117,85 @@ if not os.path.exists(placeholder_image_path):
     except Exception as e:
         print(f"Could not create placeholder image: {e}")
 
-# Create database tables and initial admin if they don't exist.
-# This will run when the app starts. For Render, this might run during build/deploy.
-# For production, migrations (e.g. Flask-Migrate) are a better approach for schema changes.
-with app.app_context():
+# Schema is managed by Alembic (migrations/, `flask --app src.main db ...`). Every boot checks the
+# schema (a single alembic_version lookup) and seeds the owner; only the migrations themselves are
+# gated: they run at import when RUN_DB_INIT is set (the default for local SQLite), otherwise once
+# per deploy via `flask --app src.main init-db`. A boot against an out-of-date schema refuses to start.
+RUN_DB_INIT = os.getenv('RUN_DB_INIT', '1' if USING_SQLITE else '').lower() in ('1', 'true', 'yes')
+BASELINE_REVISION = 'b1f0c2a7d9e3' # the schema the old db.create_all() startup produced
+OWNER_TELEGRAM_ID = 7839645457 # This could also be an env var
+
+def _schema_initialized():
+    heads = set(ScriptDirectory.from_config(migrate.get_config()).get_heads())
+    with db.engine.connect() as conn:
+        return set(MigrationContext.configure(conn).get_current_heads()) == heads
+
+def _is_unversioned_schema():
+    with db.engine.connect() as conn:
+        return not MigrationContext.configure(conn).get_current_heads() and db.inspect(conn).has_table('mods')
+
+def seed_owner(telegram_id):
+    # One INSERT that is a no-op when the owner already exists (no SELECT first)
+    values = dict(telegram_id=telegram_id, role='owner', username='SiteOwnerRender', created_at=datetime.utcnow())
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(Admin).values(**values).on_conflict_do_nothing(index_elements=['telegram_id'])
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(Admin).values(**values).on_conflict_do_nothing(index_elements=['telegram_id'])
+    else: # MySQL
+        stmt = db.insert(Admin).values(**values).prefix_with('IGNORE')
+    result = db.session.execute(stmt)
+    db.session.commit()
+    return result.rowcount > 0
+
+class SchemaOutOfDateError(RuntimeError):
+    pass
+
+def init_db(run_migrations=True):
     try:
-        db.create_all()
-        print("Database tables checked/created.")
-        owner_telegram_id = 7839645457 # This could also be an env var
-        owner = Admin.query.filter_by(telegram_id=owner_telegram_id).first()
-        if not owner:
-            new_owner = Admin(telegram_id=owner_telegram_id, role='owner', username='SiteOwnerRender')
-            db.session.add(new_owner)
-            db.session.commit()
-            print(f"Admin user with ID {owner_telegram_id} created.")
+        if _schema_initialized():
+            print("Database schema is up to date.")
+        elif not run_migrations:
+            raise SchemaOutOfDateError(
+                "Database schema is behind the latest migration. Run `flask --app src.main init-db` "
+                "(or start with RUN_DB_INIT=1) before starting the website/bot.")
         else:
-            print(f"Admin user with ID {owner_telegram_id} already exists.")
+            if _is_unversioned_schema():
+                # Tables were created by the old create_all() startup; adopt them at the baseline revision
+                command.stamp(migrate.get_config(), BASELINE_REVISION)
+            command.upgrade(migrate.get_config(), 'head')
+            print("Database schema migrated to the latest revision.")
+        if seed_owner(OWNER_TELEGRAM_ID):
+            print(f"Admin user with ID {OWNER_TELEGRAM_ID} created.")
+        else:
+            print(f"Admin user with ID {OWNER_TELEGRAM_ID} already exists.")
+    except SchemaOutOfDateError:
+        raise
     except Exception as e:
+        db.session.rollback()
         print(f"Error during initial database setup: {e}")
         print("This might be due to the database not being ready during build on Render.")
-        print("Database setup will be attempted again when the app is fully running.")
+
+@app.cli.command('init-db')
+def init_db_command():
+    init_db()
+
+# Under the Flask CLI (e.g. `init-db` / `db upgrade` themselves) the command decides what to run
+if os.getenv('FLASK_RUN_FROM_CLI') != 'true':
+    with app.app_context():
+        try:
+            init_db(run_migrations=RUN_DB_INIT)
+        except SchemaOutOfDateError as e:
+            print(f"FATAL: {e}", file=sys.stderr)
+            raise
 
 if __name__ == '__main__':
     print("Starting Flask development server...")
     print(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
     print("To run the Telegram bot, execute: python src/bot.py")
     # Set debug=False for production, but True is fine for local dev.
-    # Render will use Gunicorn, not this app.run().
+    # Render will use Gunicorn (see gunicorn.conf.py: `gunicorn 'src.main:app'`), not this app.run().
     app.run(host='0.0.0.0', port=5000, debug=True)
 
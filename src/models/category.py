@@ -12,3 +12,6 @@ class Category(db.Model):
     def __repr__(self):
         return f'<Category {self.name}>'
 
+# Category names are unique regardless of case
+db.Index('ux_category_name_lower', db.func.lower(Category.name), unique=True)
+
@@ -1,14 +1,27 @@
 from datetime import datetime
+from sqlalchemy import DDL, event
 from src.extensions import db # Changed import from src.main to src.extensions
 
 class Mod(db.Model):
     __tablename__ = 'mods'
+    # Every public query filters on status first, so status leads each composite index
+    # (and also serves the bot's plain status filters / GROUP BY status).
+    __table_args__ = (
+        db.Index('ix_mod_status_created', 'status', 'created_at'),
+        db.Index('ix_mod_status_category', 'status', 'category_id'),
+        db.Index('ix_mod_status_name', 'status', 'name'),
+        # Substring search (name ILIKE '%q%') on approved mods; PostgreSQL only
+        db.Index('ix_mod_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'},
+                 postgresql_where=db.text("status = 'approved'")).ddl_if(dialect='postgresql'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.Text, nullable=False)
     description = db.Column(db.Text, nullable=False)
     download_link = db.Column(db.Text, nullable=False)
     image_filename = db.Column(db.Text, nullable=True)
+    telegram_file_id = db.Column(db.Text, nullable=True) # Telegram file_id of the image, reused instead of re-uploading
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     uploader_telegram_id = db.Column(db.BigInteger, nullable=False)
     status = db.Column(db.Text, nullable=False, default='pending_approval') # pending_approval, approved, rejected
@@ -22,3 +35,9 @@ class Mod(db.Model):
     def __repr__(self):
         return f'<Mod {self.name}>'
 
+# gin_trgm_ops needs the pg_trgm extension before the mods table (and its indexes) is created
+event.listen(
+    Mod.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
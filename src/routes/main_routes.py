@@ -1,43 +1,97 @@
-from flask import Blueprint, render_template, request, abort, url_for, redirect
-from sqlalchemy import or_
+from flask import Blueprint, render_template, request, abort, url_for, redirect, make_response, current_app, send_from_directory
+from sqlalchemy import or_, select
+from sqlalchemy.orm import joinedload
+from cachetools import TTLCache
+from functools import wraps
+import hashlib
+import threading
 import os
 
 # Import db from extensions, no need to import flask_app here for app_context
 from ..extensions import db
 from ..models.mod import Mod
-from ..models.category import Category
+from .. import caches
 
 main_routes = Blueprint("main_routes", __name__)
 
+SEARCH_PAGE_SIZE = 50
+# Stored image names are unique per upload (Telegram file_unique_id), so a file never changes in place
+MOD_IMAGE_MAX_AGE = 604800 # one week
+
+# Rendered pages that change on the order of minutes, keyed by content version + path.
+# TTLCache isn't thread-safe, hence the lock (threaded/gevent workers).
+_page_cache = TTLCache(maxsize=512, ttl=30)
+_page_cache_lock = threading.Lock()
+
+def cached_page(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (caches.content_version(), request.path)
+        with _page_cache_lock:
+            entry = _page_cache.get(key)
+        if entry is None:
+            body = view(*args, **kwargs)
+            entry = (body, hashlib.md5(body.encode("utf-8")).hexdigest())
+            with _page_cache_lock:
+                _page_cache[key] = entry
+        body, etag = entry
+        response = make_response(body)
+        response.set_etag(etag)
+        return response.make_conditional(request) # 304 when If-None-Match matches
+    return wrapper
+
 @main_routes.route("/")
+@cached_page
 def index():
     # Flask handles app context automatically in request handlers
-    latest_mods = Mod.query.filter_by(status="approved").order_by(Mod.created_at.desc()).limit(10).all()
-    categories = Category.query.order_by(Category.name).all()
+    # 2.0-style select(): fixed statement shapes are compiled once and reused from the statement cache
+    latest_mods = db.session.execute(
+        select(Mod).options(joinedload(Mod.category))
+        .where(Mod.status == "approved").order_by(Mod.created_at.desc()).limit(10)
+    ).scalars().all()
+    categories = caches.get_categories()
     return render_template("index.html", latest_mods=latest_mods, categories=categories)
 
 @main_routes.route("/mod/<int:mod_id>")
 def mod_detail(mod_id):
-    mod = Mod.query.filter_by(id=mod_id, status="approved").first_or_404()
+    mod = db.first_or_404(select(Mod).where(Mod.id == mod_id, Mod.status == "approved"))
     return render_template("mod_detail.html", mod=mod)
 
 @main_routes.route("/category/<int:category_id>")
+@cached_page
 def category_mods(category_id):
-    category = Category.query.get_or_404(category_id)
-    mods_in_category = Mod.query.filter_by(category_id=category.id, status="approved").order_by(Mod.name).all()
+    category = caches.get_category(category_id)
+    if category is None:
+        abort(404)
+    mods_in_category = db.session.execute(
+        select(Mod).where(Mod.category_id == category.id, Mod.status == "approved").order_by(Mod.name)
+    ).scalars().all()
     return render_template("category_mods.html", category=category, mods=mods_in_category)
 
 @main_routes.route("/search")
 def search():
     query = request.args.get("query", "")
+    page = max(request.args.get("page", 1, type=int), 1)
     results = []
+    has_next = False
     if query:
         search_term = f"%{query}%"
-        results = Mod.query.filter(
-            Mod.name.ilike(search_term),
-            Mod.status == "approved"
-        ).order_by(Mod.name).all()
-    return render_template("search_results.html", query=query, results=results)
+        # One extra row tells us whether there is a next page without a COUNT(*)
+        results = db.session.execute(
+            select(Mod).options(joinedload(Mod.category)).where(
+                Mod.name.ilike(search_term),
+                Mod.status == "approved"
+            ).order_by(Mod.name).limit(SEARCH_PAGE_SIZE + 1).offset((page - 1) * SEARCH_PAGE_SIZE)
+        ).scalars().all()
+        has_next = len(results) > SEARCH_PAGE_SIZE
+        results = results[:SEARCH_PAGE_SIZE]
+    return render_template("search_results.html", query=query, results=results, page=page, has_next=has_next)
+
+@main_routes.route("/uploads/mods_images/<path:name>")
+def mod_image(name):
+    # conditional=True answers If-None-Match/If-Modified-Since/Range from the file's stat
+    return send_from_directory(current_app.config["MOD_IMAGES_FOLDER"], name,
+                               conditional=True, max_age=MOD_IMAGE_MAX_AGE)
 
 @main_routes.route("/ping")
 def ping():